@@ -1,8 +1,15 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 import joblib
+import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import sys
+
+# Shared helpers for the Python services live in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from profiling import init_fastapi
+from input_monitor import InputMonitor
 
 app = FastAPI()
 
@@ -15,6 +22,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (PROFILE_SAMPLE_RATE, or X-Profile with PROFILE_HEADER_ENABLED=1)
+init_fastapi(app, "doctor")
+
 # Load your trained model
 model_path = "risk_model.pkl"
 if os.path.exists(model_path):
@@ -24,6 +34,14 @@ else:
     print(f"❌ Model file not found at {model_path}. Please run machine.py first.")
     model = None
 
+# Input/score drift monitoring against the training data
+MONITORED_FEATURES = ["age", "cholesterol", "blood_pressure", "bmi"]
+monitor = None
+if model is not None and os.path.exists("patients_data.csv"):
+    training_data = pd.read_csv("patients_data.csv")
+    training_scores = model.predict_proba(training_data[["age", "cholesterol", "blood_pressure", "bmi", "smoking"]])[:, 1]
+    monitor = InputMonitor.from_training(training_data, MONITORED_FEATURES, training_scores)
+
 # Define expected input data
 class PatientData(BaseModel):
     age: int
@@ -41,6 +59,8 @@ async def predict(data: PatientData):
         input_data = [[data.age, data.cholesterol, data.blood_pressure, data.bmi, data.smoking]]
         probability = model.predict_proba(input_data)[0][1]
         percent_risk = round(probability * 100, 2)
+        if monitor is not None:
+            monitor.observe({name: getattr(data, name) for name in MONITORED_FEATURES}, probability)
 
         return {
             "prediction": probability,
@@ -59,3 +79,8 @@ async def predict(data: PatientData):
 async def health_check():
     return {"status": "OK", "service": "Doctor ML Prediction Service", "port": 8001}
 
+@app.get("/monitoring")
+async def monitoring():
+    if monitor is None:
+        return {"error": "Monitoring unavailable (model or patients_data.csv missing)", "success": False}
+    return {"features": monitor.report(), "success": True}
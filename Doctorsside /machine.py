@@ -1,7 +1,15 @@
+import argparse
+import os
+import sys
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 import joblib
 
+parser = argparse.ArgumentParser(description="Train the cardiovascular risk model")
+parser.add_argument("--tune", action="store_true",
+                    help="cross-validated search over solvers, regularization and other estimators")
+args = parser.parse_args()
+
 # Load data
 data = pd.read_csv("patients_data.csv")
 
@@ -9,9 +17,31 @@ data = pd.read_csv("patients_data.csv")
 X = data[["age", "cholesterol", "blood_pressure", "bmi", "smoking"]]
 y = data["risk_level"]
 
-# Train model
-model = LogisticRegression()
-model.fit(X, y)
+if args.tune:
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.model_selection import StratifiedKFold
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+    from model_selection import tune_model
+
+    # Every candidate must support predict_proba (used by app.py)
+    candidates = [
+        (LogisticRegression(max_iter=1000), {"C": [0.01, 0.1, 1, 10, 100], "solver": ["lbfgs", "liblinear"]}),
+        (LogisticRegression(max_iter=1000, solver="saga"), {"C": [0.01, 0.1, 1, 10], "l1_ratio": [0, 1]}),
+        (SGDClassifier(loss="log_loss", random_state=42), {"alpha": [1e-5, 1e-4, 1e-3, 1e-2]}),
+        (HistGradientBoostingClassifier(random_state=42), {"learning_rate": [0.05, 0.1], "max_depth": [3, None]}),
+    ]
+    folds = StratifiedKFold(n_splits=min(5, int(y.value_counts().min())), shuffle=True, random_state=42)
+    model, report = tune_model(X, y, candidates, folds, scoring={"roc_auc": "roc_auc", "accuracy": "accuracy"},
+                               refit="roc_auc", report_path="risk_model_report.json")
+    print(f"✅ Searched {report['candidates']} candidates in {report['search_seconds']}s, "
+          f"best: {report['best_estimator']} {report['best_params']} {report['best_score']}")
+    print("✅ Report saved as risk_model_report.json")
+else:
+    # Train model
+    model = LogisticRegression()
+    model.fit(X, y)
 
 # Save
 joblib.dump(model, "risk_model.pkl")
@@ -4,29 +4,82 @@ Simple OCR Microservice using PaddleOCR
 Runs on port 3001 and processes medical reports
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+import hmac
+import io
 import os
+import sys
 import json
 import logging
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 
+from deadline import Deadline, NO_DEADLINE
+from engine_pool import EnginePool, PoolTimeout
+from tiling import needs_tiling, process_image_tiled
+from cascade import CascadeEngine, build_cascade_engine, cascade_enabled
+from extraction import EXTRACTOR_VERSION, extract_medical_data
+from ocr_archive import archive_enabled, load_record, save_record
+
+# Shared helpers for the Python services live in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from profiling import init_flask
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Uploads are decoded in memory; same limit as the Node OCR server
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class InMemoryRequest(Request):
+    """Keep multipart file parts in memory instead of spooling them to disk"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+# Werkzeug rejects larger bodies while they are still being read
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app)
+init_flask(app, "ocr")
+
+# Bearer token required by GET /ocr/records/<id>; the endpoint is disabled
+# when it is not set, since records hold full medical report text
+OCR_RECORDS_TOKEN = os.environ.get('OCR_RECORDS_TOKEN', '')
+
+# Engines per worker process, and how long a request waits for a free one
+OCR_POOL_SIZE = int(os.environ.get('OCR_POOL_SIZE', '2'))
+OCR_POOL_TIMEOUT = float(os.environ.get('OCR_POOL_TIMEOUT', '30'))
+
+def warm_up_engine(engine):
+    """Run one tiny prediction so model loading happens at startup"""
+    import numpy as np
+    image = np.full((48, 192, 3), 255, dtype=np.uint8)
+    # A blank page finds no lines, so the cascade runs both pipelines here
+    engine.predict(image)
+    if isinstance(engine, CascadeEngine):
+        # Low-confidence line re-reads use a separate recognition model
+        engine.recognizer.predict([image])
 
 # Try to initialize PaddleOCR
 OCR_AVAILABLE = False
-ocr_engine = None
+ocr_pool = None
 
 try:
     from paddleocr import PaddleOCR
-    ocr_engine = PaddleOCR(use_textline_orientation=True, lang='en')
+    # OCR_CASCADE=1 pools fast+full engine pairs instead (see cascade.py)
+    ocr_pool = EnginePool(
+        build_cascade_engine if cascade_enabled() else lambda: PaddleOCR(use_textline_orientation=True, lang='en'),
+        size=OCR_POOL_SIZE,
+        timeout=OCR_POOL_TIMEOUT,
+        warmup=warm_up_engine
+    )
     OCR_AVAILABLE = True
-    logger.info("PaddleOCR initialized successfully")
+    logger.info(f"PaddleOCR initialized successfully ({OCR_POOL_SIZE} engines)")
 except ImportError as e:
     logger.warning(f"PaddleOCR not available: {e}")
     logger.info("Using mock OCR service (install paddleocr to enable real OCR)")
@@ -34,6 +87,68 @@ except Exception as e:
     logger.error(f"Failed to initialize PaddleOCR: {e}")
     logger.info("Using mock OCR service")
 
+@contextmanager
+def checkout_engine(deadline=None):
+    """Borrow a pooled engine, waiting no longer than the request deadline"""
+    if ocr_pool is None:
+        yield None
+        return
+    timeout = min(ocr_pool.timeout, (deadline or NO_DEADLINE).remaining())
+    with ocr_pool.checkout(timeout=timeout) as engine:
+        yield engine
+
+def is_pdf(source):
+    """PDFs are recognized by extension for paths and by magic bytes for uploads"""
+    if isinstance(source, str):
+        return source.lower().endswith('.pdf')
+    return isinstance(source, (bytes, bytearray)) and source[:5] == b'%PDF-'
+
+def parse_flag(value):
+    """Bool option that may arrive as JSON, a form field or a query string"""
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def read_limited(stream, limit=MAX_UPLOAD_BYTES):
+    """Read a body in chunks, giving up as soon as it exceeds `limit` bytes"""
+    buffer = io.BytesIO()
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return buffer.getvalue()
+        if buffer.tell() + len(chunk) > limit:
+            raise RequestEntityTooLarge()
+        buffer.write(chunk)
+
+def read_upload():
+    """
+    Read a document sent as a multipart `file` field or as a raw image/PDF
+    request body. Options come from the form fields or the query string.
+
+    Returns:
+        tuple: (source, filename, options), or None for a JSON filePath request.
+               source is the PDF bytes, or a BytesIO holding the image.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return None
+        content = read_limited(upload.stream)
+        filename = upload.filename or 'upload'
+        options = request.form.to_dict()
+    elif request.mimetype.startswith('image/') or request.mimetype in ('application/pdf', 'application/octet-stream'):
+        content = read_limited(request.stream)
+        filename = request.args.get('filename', 'upload')
+        options = request.args.to_dict()
+    else:
+        return None
+
+    if not content or is_pdf(content):
+        return content, filename, options
+    image = io.BytesIO(content)
+    image.name = filename
+    return image, filename, options
+
 def mock_ocr_processing(file_path):
     """Mock OCR processing for when PaddleOCR is not available"""
     logger.info(f"Running mock OCR processing for: {file_path}")
@@ -51,13 +166,31 @@ def mock_ocr_processing(file_path):
         "mock": True
     }
 
-def process_with_paddleocr(file_path):
-    """Process image with PaddleOCR"""
+def process_with_paddleocr(file_path, engine, tiled=None, deadline=None):
+    """Process image with a checked-out engine (large scans are tiled, see tiling.py)"""
     try:
         start_time = datetime.now()
-        
-        # Run OCR
-        result = ocr_engine.predict(file_path)
+
+        if tiled or (tiled is None and needs_tiling(file_path)):
+            tiled_result = process_image_tiled(file_path, engine, deadline=deadline)
+            if not tiled_result["success"]:
+                raise RuntimeError(tiled_result["error"])
+            extracted_text = " ".join(line["text"] for line in tiled_result["lines"])
+            return {
+                "success": True,
+                "extractedText": extracted_text,
+                "structuredData": extract_medical_data(extracted_text),
+                "confidence": tiled_result["confidence"],
+                "processing_time": (datetime.now() - start_time).total_seconds(),
+                "tiles": tiled_result["tiles"],
+                "partial": tiled_result["partial"],
+                "lines": tiled_result["lines"],
+                "mock": False
+            }
+
+        # Run OCR (uploads are decoded in memory)
+        from paddle_ocr import extract_ocr_lines, load_ocr_input
+        result = engine.predict(load_ocr_input(file_path))
         
         # Extract text from results
         extracted_text = ""
@@ -104,6 +237,7 @@ def process_with_paddleocr(file_path):
             "structuredData": structured_data,
             "confidence": avg_confidence,
             "processing_time": processing_time,
+            "lines": extract_ocr_lines(result),
             "mock": False
         }
         
@@ -115,55 +249,213 @@ def process_with_paddleocr(file_path):
             "mock": False
         }
 
-def extract_medical_data(text):
-    """Extract structured medical data from text using simple keyword matching"""
-    text_lower = text.lower()
-    structured_data = {}
-    
-    # Blood pressure patterns
-    import re
-    bp_pattern = r'(\d{2,3})/(\d{2,3})'
-    bp_match = re.search(bp_pattern, text)
-    if bp_match:
-        structured_data['blood_pressure'] = f"{bp_match.group(1)}/{bp_match.group(2)}"
-    
-    # Glucose patterns
-    glucose_patterns = [
-        r'glucose[:\s]*(\d+\.?\d*)\s*mg/dl',
-        r'blood sugar[:\s]*(\d+\.?\d*)',
-        r'fasting glucose[:\s]*(\d+\.?\d*)'
-    ]
-    for pattern in glucose_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            structured_data['glucose'] = f"{match.group(1)} mg/dL"
-            break
-    
-    # Date patterns
-    date_patterns = [
-        r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-        r'(\d{2,4}[-/]\d{1,2}[-/]\d{1,2})'
-    ]
-    for pattern in date_patterns:
-        match = re.search(pattern, text)
-        if match:
-            structured_data['date'] = match.group(1)
-            break
-    
-    # Patient name (simple heuristic)
-    name_patterns = [
-        r'patient[:\s]*([a-zA-Z\s]+)',
-        r'name[:\s]*([a-zA-Z\s]+)'
-    ]
-    for pattern in name_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            name = match.group(1).strip().title()
-            if len(name) > 2 and len(name) < 50:
-                structured_data['patient_name'] = name
-            break
-    
-    return structured_data
+def process_pdf_with_paddleocr(file_path, engine, deadline=None):
+    """Process a PDF page by page, returning finished pages if time runs out"""
+    from paddle_ocr import process_pdf_ocr
+
+    start_time = datetime.now()
+    pdf_result = process_pdf_ocr(file_path, engine, deadline=deadline)
+    if not pdf_result["success"]:
+        logger.error(f"PDF OCR processing failed: {pdf_result['error']}")
+        return {
+            "success": False,
+            "error": f"OCR processing failed: {pdf_result['error']}",
+            "mock": False
+        }
+
+    return {
+        "success": True,
+        "extractedText": pdf_result["text"],
+        "structuredData": extract_medical_data(pdf_result["text"]),
+        "confidence": pdf_result["confidence"],
+        "processing_time": (datetime.now() - start_time).total_seconds(),
+        "pages_processed": pdf_result["pages_processed"],
+        "pages_total": pdf_result["pages_total"],
+        "partial": pdf_result["partial"],
+        "lines": pdf_result["lines"],
+        "mock": False
+    }
+
+def archive_result(result, filename, lines=None):
+    """Store the raw lines so fields can be re-extracted later (see reextract.py)"""
+    if not result.get("success") or result.get("mock") or not archive_enabled():
+        return result
+    try:
+        result["recordId"] = save_record(
+            result.get("lines", []) if lines is None else lines,
+            result["extractedText"],
+            result["structuredData"],
+            EXTRACTOR_VERSION,
+            filename=filename
+        )
+        result["extractorVersion"] = EXTRACTOR_VERSION
+    except OSError as e:
+        logger.error(f"Failed to archive OCR result: {str(e)}")
+    return result
+
+def records_authorized():
+    """Check the request's bearer token against OCR_RECORDS_TOKEN"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), OCR_RECORDS_TOKEN.encode())
+
+def request_deadline(data):
+    """
+    Deadline from the X-Request-Timeout-Ms header or the timeoutMs field
+
+    Raises:
+        ValueError: If the timeout is not a valid number of milliseconds
+    """
+    timeout_ms = request.headers.get('X-Request-Timeout-Ms') or data.get('timeoutMs')
+    return Deadline.from_timeout_ms(timeout_ms)
+
+def stream_format(data):
+    """Streaming format requested via the stream field or Accept header, if any"""
+    fmt = data.get('stream')
+    if fmt in ('ndjson', 'sse'):
+        return fmt
+    if parse_flag(fmt) or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        return 'ndjson'
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return 'sse'
+    return None
+
+def iter_ocr_records(file_path, engine, tiled=None, deadline=None, label=None):
+    """
+    Yield one record per recognized page as soon as it is done, then a
+    final summary record with the combined text and structured data
+    """
+    start_time = datetime.now()
+    page_texts = []
+    lines = []
+    total_confidence = 0
+    total_lines = 0
+    partial = False
+    errors = []
+
+    if OCR_AVAILABLE and is_pdf(file_path):
+        from paddle_ocr import iter_pdf_pages, pdf_page_count, pdf_page_text
+
+        pages_total = pdf_page_count(file_path)
+        for page_num, result in iter_pdf_pages(file_path, engine, pages_total, deadline):
+            if not result["success"]:
+                errors.append(result["error"])
+                yield {"type": "page", "page": page_num, "success": False, "error": result["error"]}
+                continue
+            # Same page markers as the non-streaming response (process_pdf_ocr)
+            page_texts.append(pdf_page_text(page_num, result["text"]))
+            lines.extend(dict(line, page=page_num) for line in result.get("lines", []))
+            total_confidence += result["confidence"] * result["lines_detected"]
+            total_lines += result["lines_detected"]
+            partial = partial or result.get("partial", False)
+            yield {
+                "type": "page",
+                "page": page_num,
+                "pages_total": pages_total,
+                "success": True,
+                "text": result["text"],
+                "confidence": result["confidence"],
+                "structuredData": extract_medical_data(result["text"]),
+                "lines": result.get("lines", []),
+                "partial": result.get("partial", False)
+            }
+        confidence = total_confidence / total_lines if total_lines else 0
+        partial = partial or len(page_texts) < pages_total
+    else:
+        pages_total = 1
+        if OCR_AVAILABLE:
+            result = process_with_paddleocr(file_path, engine, tiled=tiled, deadline=deadline)
+        else:
+            from paddle_ocr import source_name
+            result = mock_ocr_processing(source_name(file_path))
+        if not result["success"]:
+            errors.append(result["error"])
+            yield {"type": "page", "page": 1, "success": False, "error": result["error"]}
+            confidence = 0
+        else:
+            page_texts.append(result["extractedText"])
+            lines.extend(result.get("lines", []))
+            confidence = result["confidence"]
+            partial = result.get("partial", False)
+            yield {
+                "type": "page",
+                "page": 1,
+                "pages_total": 1,
+                "success": True,
+                "text": result["extractedText"],
+                "confidence": result["confidence"],
+                "structuredData": result["structuredData"],
+                "lines": result.get("lines", []),
+                "partial": partial
+            }
+
+    if errors and not page_texts:
+        # Every page failed: report it like the non-streaming path, unarchived
+        yield {
+            "type": "summary",
+            "success": False,
+            "error": errors[0],
+            "pages_processed": 0,
+            "pages_total": pages_total,
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "mock": not OCR_AVAILABLE
+        }
+        return
+
+    extracted_text = "".join(page_texts).strip()
+    yield archive_result({
+        "type": "summary",
+        "success": True,
+        "extractedText": extracted_text,
+        "structuredData": extract_medical_data(extracted_text),
+        "confidence": confidence,
+        "pages_processed": len(page_texts),
+        "pages_total": pages_total,
+        "partial": partial,
+        "processing_time": (datetime.now() - start_time).total_seconds(),
+        "mock": not OCR_AVAILABLE
+    }, label, lines=lines)
+
+def stream_ocr_response(file_path, fmt, tiled=None, deadline=None, cascade=None, label=None):
+    """
+    Stream iter_ocr_records() as NDJSON lines or Server-Sent Events
+
+    The engine is checked out before the response starts, so a busy pool
+    raises PoolTimeout here (a 503) instead of inside a 200 stream. It is
+    returned to the pool when the response is closed.
+    """
+    engines = ExitStack()
+    engine = engines.enter_context(checkout_engine(deadline))
+    if isinstance(engine, CascadeEngine) and cascade is False:
+        engine = engine.full
+
+    def generate():
+        try:
+            for record in iter_ocr_records(file_path, engine, tiled=tiled, deadline=deadline, label=label):
+                if fmt == 'sse':
+                    yield f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+                else:
+                    yield json.dumps(record) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming OCR failed: {str(e)}")
+            record = {"type": "error", "success": False, "error": f"OCR processing failed: {str(e)}"}
+            if fmt == 'sse':
+                yield f"event: error\ndata: {json.dumps(record)}\n\n"
+            else:
+                yield json.dumps(record) + "\n"
+
+    try:
+        response = Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream' if fmt == 'sse' else 'application/x-ndjson',
+            # Stop proxies from buffering the stream until it ends
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception:
+        engines.close()
+        raise
+    # Also runs if the client disconnects before the stream starts
+    response.call_on_close(engines.close)
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -173,48 +465,103 @@ def health_check():
         "service": "OCR Microservice",
         "port": 3001,
         "ocr_available": OCR_AVAILABLE,
+        "engine_pool": ocr_pool.stats() if ocr_pool else None,
         "timestamp": datetime.now().isoformat()
     })
 
 @app.route('/ocr', methods=['POST'])
 def process_ocr():
-    """Main OCR processing endpoint"""
+    """
+    Main OCR processing endpoint
+
+    Accepts a JSON body with a filePath on the shared filesystem, a
+    multipart upload with a `file` field, or the raw image/PDF as the
+    request body. Uploads are decoded in memory and never touch the disk.
+    """
     try:
-        data = request.get_json()
-        
-        if not data or 'filePath' not in data:
+        upload = read_upload()
+        if upload is not None:
+            file_path, label, data = upload
+            if not file_path:
+                return jsonify({
+                    "success": False,
+                    "error": "Uploaded file is empty"
+                }), 400
+            logger.info(f"Processing OCR for uploaded file: {label}")
+        else:
+            data = request.get_json(silent=True)
+
+            if not data or 'filePath' not in data:
+                return jsonify({
+                    "success": False,
+                    "error": "Missing filePath or file upload in request"
+                }), 400
+
+            file_path = label = data['filePath']
+            logger.info(f"Processing OCR for file: {file_path}")
+
+            # Handle relative paths - the uploads folder is in the parent directory
+            if not os.path.isabs(file_path):
+                # Convert relative path to absolute path
+                parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                file_path = os.path.join(parent_dir, file_path)
+                logger.info(f"Converted to absolute path: {file_path}")
+
+            # Check if file exists
+            if not os.path.exists(file_path):
+                logger.error(f"File not found: {file_path}")
+                return jsonify({
+                    "success": False,
+                    "error": f"File not found: {file_path}"
+                }), 404
+
+        try:
+            deadline = request_deadline(data)
+        except ValueError as e:
             return jsonify({
                 "success": False,
-                "error": "Missing filePath in request"
+                "error": str(e)
             }), 400
-        
-        file_path = data['filePath']
-        logger.info(f"Processing OCR for file: {file_path}")
-
-        # Handle relative paths - the uploads folder is in the parent directory
-        if not os.path.isabs(file_path):
-            # Convert relative path to absolute path
-            parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            file_path = os.path.join(parent_dir, file_path)
-            logger.info(f"Converted to absolute path: {file_path}")
-
-        # Check if file exists
-        if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
+        if deadline.expired():
             return jsonify({
                 "success": False,
-                "error": f"File not found: {file_path}"
-            }), 404
-        
+                "error": "Request deadline expired before processing started",
+                "partial": True
+            }), 504
+
+        # Send each page as soon as it is recognized if asked to
+        fmt = stream_format(data)
+        if fmt:
+            logger.info(f"Streaming OCR results ({fmt}) for {label}")
+            return stream_ocr_response(file_path, fmt, tiled=parse_flag(data.get('tiled')), deadline=deadline,
+                                       cascade=parse_flag(data.get('cascade')), label=label)
+
         # Process with appropriate OCR method
-        if OCR_AVAILABLE:
-            result = process_with_paddleocr(file_path)
-        else:
-            result = mock_ocr_processing(file_path)
+        with checkout_engine(deadline) as engine:
+            # "cascade": false forces the full model for this request
+            if isinstance(engine, CascadeEngine) and parse_flag(data.get('cascade')) is False:
+                engine = engine.full
+            if OCR_AVAILABLE and is_pdf(file_path):
+                result = process_pdf_with_paddleocr(file_path, engine, deadline=deadline)
+            elif OCR_AVAILABLE:
+                result = process_with_paddleocr(file_path, engine, tiled=parse_flag(data.get('tiled')), deadline=deadline)
+            else:
+                result = mock_ocr_processing(label)
         
-        logger.info(f"OCR processing completed for {file_path}")
-        return jsonify(result)
+        logger.info(f"OCR processing completed for {label}")
+        return jsonify(archive_result(result, label))
         
+    except PoolTimeout as e:
+        logger.warning(f"OCR engine pool exhausted: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "OCR service is busy, try again shortly"
+        }), 503
+    except RequestEntityTooLarge:
+        return jsonify({
+            "success": False,
+            "error": f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB limit"
+        }), 413
     except Exception as e:
         logger.error(f"OCR processing error: {str(e)}")
         return jsonify({
@@ -222,7 +569,29 @@ def process_ocr():
             "error": f"Internal server error: {str(e)}"
         }), 500
 
+@app.route('/ocr/records/<record_id>', methods=['GET'])
+def get_ocr_record(record_id):
+    """Archived OCR result with its current structured data (see reextract.py)"""
+    if not OCR_RECORDS_TOKEN:
+        return jsonify({
+            "success": False,
+            "error": "OCR record access is disabled (set OCR_RECORDS_TOKEN)"
+        }), 403
+    if not records_authorized():
+        return jsonify({
+            "success": False,
+            "error": "Missing or invalid bearer token"
+        }), 401, {"WWW-Authenticate": "Bearer"}
+    record = load_record(record_id)
+    if record is None:
+        return jsonify({
+            "success": False,
+            "error": f"OCR record not found: {record_id}"
+        }), 404
+    return jsonify({"success": True, **record})
+
 if __name__ == '__main__':
     logger.info("Starting OCR Microservice on port 3001...")
     logger.info(f"PaddleOCR available: {OCR_AVAILABLE}")
-    app.run(host='0.0.0.0', port=3001, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=3001, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
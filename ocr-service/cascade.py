@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Two-tier OCR cascade
+
+Clean printed lab reports read fine with the mobile detection and
+recognition models, which are several times faster than the server
+models. The cascade runs the mobile pipeline first and only falls back
+to the server models where the mobile result is unsure:
+
+- if most lines of a page score below the threshold (or nothing was
+  found at all) the whole page is re-run with the full pipeline
+- otherwise only the low-scoring lines are cropped and re-read by the
+  full recognition model, keeping whichever reading scores higher
+
+Each recognized line is tagged with the tier ("fast" or "full") that
+produced it.
+"""
+
+import os
+
+from paddle_ocr import extract_ocr_lines, load_ocr_input
+
+FAST_DET_MODEL = os.environ.get('OCR_FAST_DET_MODEL', 'PP-OCRv5_mobile_det')
+FAST_REC_MODEL = os.environ.get('OCR_FAST_REC_MODEL', 'PP-OCRv5_mobile_rec')
+FULL_DET_MODEL = os.environ.get('OCR_FULL_DET_MODEL', 'PP-OCRv5_server_det')
+FULL_REC_MODEL = os.environ.get('OCR_FULL_REC_MODEL', 'PP-OCRv5_server_rec')
+
+# Lines scoring below this are re-read by the full model
+CASCADE_THRESHOLD = float(os.environ.get('OCR_CASCADE_THRESHOLD', '0.85'))
+# Re-run the whole page when more than this fraction of lines is below it
+PAGE_RERUN_FRACTION = 0.5
+
+def cascade_enabled():
+    return os.environ.get('OCR_CASCADE') == '1'
+
+class CascadeEngine:
+    """Fast pipeline first, full models only where confidence is low"""
+
+    def __init__(self, fast, full, recognizer, threshold=CASCADE_THRESHOLD,
+                 page_rerun_fraction=PAGE_RERUN_FRACTION):
+        """
+        Args:
+            fast: Lightweight PaddleOCR pipeline
+            full: Full PaddleOCR pipeline, used for page re-runs
+            recognizer: Full TextRecognition model, used for line re-reads
+            threshold (float): Minimum rec_score accepted from the fast tier
+            page_rerun_fraction (float): Share of low lines that triggers a
+                                         full page re-run
+        """
+        self.fast = fast
+        self.full = full
+        self.recognizer = recognizer
+        self.threshold = threshold
+        self.page_rerun_fraction = page_rerun_fraction
+
+    def predict(self, ocr_input, **kwargs):
+        """Same call and result shape as PaddleOCR.predict(), plus rec_tiers"""
+        lines = extract_ocr_lines(self.fast.predict(ocr_input, **kwargs))
+        low = [i for i, line in enumerate(lines) if line["confidence"] < self.threshold]
+
+        if not lines or len(low) > self.page_rerun_fraction * len(lines):
+            lines = extract_ocr_lines(self.full.predict(ocr_input, **kwargs))
+            return [_as_result(lines, "full")]
+
+        for line in lines:
+            line["tier"] = "fast"
+        low = [i for i in low if lines[i]["box"] is not None]
+        if low:
+            self._reread_lines(ocr_input, [lines[i] for i in low])
+        return [_as_result(lines)]
+
+    def _reread_lines(self, ocr_input, lines):
+        """Re-recognize line crops with the full model, keeping better readings"""
+        if isinstance(ocr_input, str):
+            from PIL import Image
+            with Image.open(ocr_input) as img:
+                image = load_ocr_input(img)
+        else:
+            image = ocr_input
+
+        height, width = image.shape[:2]
+        crops = []
+        for line in lines:
+            x0, y0, x1, y1 = line["box"]
+            crops.append(image[max(0, int(y0)):min(height, int(y1) + 1),
+                               max(0, int(x0)):min(width, int(x1) + 1)])
+        # Degenerate boxes can't be re-read
+        pairs = [(line, crop) for line, crop in zip(lines, crops) if crop.size]
+        if not pairs:
+            return
+
+        rereads = self.recognizer.predict([crop for _, crop in pairs])
+        for (line, _), reread in zip(pairs, rereads):
+            score = float(reread.get('rec_score', 0))
+            if score > line["confidence"]:
+                line["text"] = reread.get('rec_text', line["text"])
+                line["confidence"] = score
+                line["tier"] = "full"
+
+def _as_result(lines, tier=None):
+    """Pack lines back into PaddleOCR's dictionary result format"""
+    return {
+        "rec_texts": [line["text"] for line in lines],
+        "rec_scores": [line["confidence"] for line in lines],
+        "rec_boxes": [line["box"] for line in lines],
+        "rec_tiers": [tier or line.get("tier", "fast") for line in lines]
+    }
+
+def build_cascade_engine():
+    """Create the fast pipeline, full pipeline and full recognizer"""
+    from paddleocr import PaddleOCR, TextRecognition
+
+    fast = PaddleOCR(
+        text_detection_model_name=FAST_DET_MODEL,
+        text_recognition_model_name=FAST_REC_MODEL,
+        use_textline_orientation=True
+    )
+    full = PaddleOCR(
+        text_detection_model_name=FULL_DET_MODEL,
+        text_recognition_model_name=FULL_REC_MODEL,
+        use_textline_orientation=True
+    )
+    recognizer = TextRecognition(model_name=FULL_REC_MODEL)
+    return CascadeEngine(fast, full, recognizer)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Request deadlines for the OCR pipeline
+
+The caller (server.js or an HTTP client) gives up after a fixed time. A
+Deadline is checked cooperatively between pages and stages so the
+pipeline can return what it has finished instead of being killed.
+"""
+
+import math
+import time
+
+# Work that would finish within this many seconds of the deadline is not started
+SAFETY_MARGIN = 0.5
+# Skip optional stages when less than this many page-times remain
+PRESSURE_FACTOR = 2.0
+
+class Deadline:
+    """A point in time after which results are no longer useful"""
+
+    def __init__(self, seconds=None):
+        self.expires_at = None if seconds is None else time.monotonic() + float(seconds)
+
+    @classmethod
+    def from_timeout_ms(cls, timeout_ms):
+        """
+        Build a deadline from a millisecond timeout given as a number or a
+        string (None, "" and 0 mean no deadline)
+
+        Raises:
+            ValueError: If the timeout is not a finite, non-negative number
+        """
+        if timeout_ms is None or timeout_ms == '':
+            return cls()
+        try:
+            if isinstance(timeout_ms, bool):
+                raise TypeError
+            milliseconds = float(timeout_ms)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid timeout: {timeout_ms!r} is not a number of milliseconds")
+        if not math.isfinite(milliseconds) or milliseconds < 0:
+            raise ValueError(f"Invalid timeout: {timeout_ms!r} must be a non-negative number of milliseconds")
+        if milliseconds == 0:
+            return cls()
+        return cls(milliseconds / 1000.0)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= SAFETY_MARGIN
+
+    def can_afford(self, estimate):
+        """True if work expected to take `estimate` seconds finishes in time"""
+        return self.remaining() - SAFETY_MARGIN > (estimate or 0)
+
+    def under_pressure(self, estimate):
+        """True if optional stages should be skipped to save time"""
+        if self.expires_at is None or not estimate:
+            return False
+        return self.remaining() < estimate * PRESSURE_FACTOR
+
+NO_DEADLINE = Deadline()
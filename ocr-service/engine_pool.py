@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Pool of pre-warmed OCR engines
+
+A PaddleOCR instance is not safe to share between threads, and creating
+one per request takes seconds. The pool builds N engines at startup and
+lends each one to a single request at a time; requests that find every
+engine busy wait up to a timeout.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+class PoolTimeout(Exception):
+    """No engine became free within the checkout timeout"""
+
+class EnginePool:
+    """Fixed-size pool of OCR engines with checkout wait statistics"""
+
+    def __init__(self, factory, size, timeout=30.0, warmup=None):
+        """
+        Args:
+            factory: Callable returning a new engine
+            size (int): Number of engines to create
+            timeout (float): Default seconds to wait for a free engine
+            warmup: Optional callable run once on each new engine so the
+                    first real request doesn't pay for lazy initialization
+        """
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        for _ in range(size):
+            engine = factory()
+            if warmup is not None:
+                warmup(engine)
+            self._idle.put(engine)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an engine for the duration of a with-block"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            engine = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._waiting -= 1
+                self._timeouts += 1
+            raise PoolTimeout(f"No OCR engine available after {timeout}s")
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._waiting -= 1
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(engine)
+
+    def stats(self):
+        """Utilization and wait time counters since startup"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "utilization": round(self._in_use / self.size, 3) if self.size else 0,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(1000 * self._total_wait / self._checkouts, 2) if self._checkouts else 0,
+                "max_wait_ms": round(1000 * self._max_wait, 2)
+            }
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Structured field extraction from recognized OCR text
+
+Bump EXTRACTOR_VERSION whenever the rules below change; reextract.py
+uses it to find archived documents extracted by an older version.
+"""
+
+import re
+
+EXTRACTOR_VERSION = 1
+
+# Blood pressure patterns
+BP_PATTERN = re.compile(r'(\d{2,3})/(\d{2,3})')
+
+# Glucose patterns (matched against lowercased text)
+GLUCOSE_PATTERNS = [re.compile(p) for p in (
+    r'glucose[:\s]*(\d+\.?\d*)\s*mg/dl',
+    r'blood sugar[:\s]*(\d+\.?\d*)',
+    r'fasting glucose[:\s]*(\d+\.?\d*)'
+)]
+
+# Date patterns
+DATE_PATTERNS = [re.compile(p) for p in (
+    r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    r'(\d{2,4}[-/]\d{1,2}[-/]\d{1,2})'
+)]
+
+# Patient name patterns (matched against lowercased text)
+NAME_PATTERNS = [re.compile(p) for p in (
+    r'patient[:\s]*([a-zA-Z\s]+)',
+    r'name[:\s]*([a-zA-Z\s]+)'
+)]
+
+def extract_medical_data(text):
+    """Extract structured medical data from text using simple keyword matching"""
+    text_lower = text.lower()
+    structured_data = {}
+    
+    bp_match = BP_PATTERN.search(text)
+    if bp_match:
+        structured_data['blood_pressure'] = f"{bp_match.group(1)}/{bp_match.group(2)}"
+    
+    for pattern in GLUCOSE_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            structured_data['glucose'] = f"{match.group(1)} mg/dL"
+            break
+    
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            structured_data['date'] = match.group(1)
+            break
+    
+    # Patient name (simple heuristic)
+    for pattern in NAME_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            name = match.group(1).strip().title()
+            if len(name) > 2 and len(name) < 50:
+                structured_data['patient_name'] = name
+            break
+    
+    return structured_data
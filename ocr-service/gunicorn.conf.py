@@ -0,0 +1,21 @@
+"""
+Production server settings for the OCR microservice
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Each worker process loads its own pool of OCR_POOL_SIZE engines, so
+concurrent OCR capacity is OCR_WORKERS x OCR_POOL_SIZE. Size the two so
+their product roughly matches the cores available.
+"""
+
+import os
+
+bind = "0.0.0.0:3001"
+workers = int(os.environ.get("OCR_WORKERS", "1"))
+worker_class = "gthread"
+# A couple of threads beyond the pool keep /health responsive under load;
+# extra OCR requests wait in the pool (OCR_POOL_TIMEOUT) and then get a 503
+threads = int(os.environ.get("OCR_POOL_SIZE", "2")) + 2
+timeout = 120
+# Engines are created after fork; Paddle predictors are not fork-safe
+preload_app = False
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Archive of raw OCR results
+
+Archiving is off by default, because records hold the full text of
+medical reports. When OCR_ARCHIVE_DIR is set, every successful OCR run
+stores its recognized lines (text, confidence, box, tier), the text the
+extractor ran on, the extracted fields and the extractor version. When
+the extraction rules improve, reextract.py updates stored records
+without running OCR again.
+
+Records are JSON files sharded by the first two characters of their id:
+    OCR_ARCHIVE_DIR/ab/ab12....json
+Records older than OCR_ARCHIVE_RETENTION_DAYS (default 30) are no longer
+served and are deleted by `python ocr_archive.py purge`, which should be
+run daily (e.g. from cron).
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+ARCHIVE_DIR = os.environ.get('OCR_ARCHIVE_DIR', '')
+RETENTION_DAYS = float(os.environ.get('OCR_ARCHIVE_RETENTION_DAYS', '30'))
+RECORD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+logger = logging.getLogger(__name__)
+
+def archive_enabled():
+    return bool(ARCHIVE_DIR)
+
+def record_path(record_id, archive_dir=None):
+    return os.path.join(archive_dir or ARCHIVE_DIR, record_id[:2], f"{record_id}.json")
+
+def write_record(path, record):
+    """Write a record atomically so readers never see a half-written file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(record, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+def save_record(lines, text, structured_data, extractor_version, filename=None):
+    """
+    Store one OCR result
+
+    Returns:
+        str: The new record id
+    """
+    record_id = uuid.uuid4().hex
+    write_record(record_path(record_id), {
+        "id": record_id,
+        "filename": filename,
+        "created": datetime.now().isoformat(),
+        "lines": lines,
+        "text": text,
+        "structuredData": structured_data,
+        "extractorVersion": extractor_version
+    })
+    return record_id
+
+def is_expired(record, retention_days=None, now=None):
+    """True if a record is older than the retention period"""
+    retention_days = RETENTION_DAYS if retention_days is None else retention_days
+    created = datetime.fromisoformat(record["created"])
+    return (now or datetime.now()) - created > timedelta(days=retention_days)
+
+def load_record(record_id):
+    """Load a record by id, or None if the id is invalid, unknown, unreadable or expired"""
+    if not archive_enabled() or not RECORD_ID_PATTERN.match(record_id or ''):
+        return None
+    try:
+        with open(record_path(record_id)) as f:
+            record = json.load(f)
+        expired = is_expired(record)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Unreadable OCR record {record_id}: {e}")
+        return None
+    return None if expired else record
+
+def iter_record_paths(archive_dir=None):
+    """Yield the path of every record in the archive"""
+    for shard in os.scandir(archive_dir or ARCHIVE_DIR):
+        if shard.is_dir():
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    yield entry.path
+
+def purge_expired(archive_dir=None, retention_days=None):
+    """
+    Delete records older than the retention period
+
+    Returns:
+        tuple: (records deleted, records kept)
+    """
+    now = datetime.now()
+    deleted = kept = 0
+    for path in iter_record_paths(archive_dir):
+        try:
+            with open(path) as f:
+                record = json.load(f)
+            expired = is_expired(record, retention_days, now)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Skipping unreadable record {path}: {e}", file=sys.stderr)
+            continue
+        if expired:
+            os.remove(path)
+            deleted += 1
+        else:
+            kept += 1
+    return deleted, kept
+
+def main():
+    """Main function for command-line usage"""
+    if len(sys.argv) != 2 or sys.argv[1] != 'purge':
+        print("Usage: python ocr_archive.py purge")
+        sys.exit(1)
+    if not archive_enabled() or not os.path.isdir(ARCHIVE_DIR):
+        print(f"Archive directory not found: {ARCHIVE_DIR or '(OCR_ARCHIVE_DIR not set)'}")
+        sys.exit(1)
+
+    deleted, kept = purge_expired()
+    print(json.dumps({"retention_days": RETENTION_DAYS, "deleted": deleted, "kept": kept}))
+
+if __name__ == "__main__":
+    main()
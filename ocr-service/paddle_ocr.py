@@ -6,8 +6,11 @@ PaddleOCR Integration Script for Medical Document Processing
 import sys
 import json
 import os
+import time
 from pathlib import Path
 
+from deadline import Deadline, NO_DEADLINE
+
 try:
     from paddleocr import PaddleOCR
     PADDLEOCR_AVAILABLE = True
@@ -19,6 +22,11 @@ def initialize_ocr():
     """Initialize PaddleOCR with optimal settings for medical documents"""
     if not PADDLEOCR_AVAILABLE:
         raise ImportError("PaddleOCR is not installed")
+
+    # Fast model first, full model only for low-confidence lines (OCR_CASCADE=1)
+    from cascade import build_cascade_engine, cascade_enabled
+    if cascade_enabled():
+        return build_cascade_engine()
     
     # Initialize with basic compatible parameters
     ocr = PaddleOCR(
@@ -27,26 +35,140 @@ def initialize_ocr():
     )
     return ocr
 
-def process_image_ocr(image_path, ocr_instance=None):
+def load_ocr_input(source):
+    """
+    Turn an image source into something ocr_instance.predict() accepts
+
+    Paths are passed through unchanged once their header has been checked.
+    File objects (e.g. uploaded bytes in a BytesIO) and PIL images are
+    decoded in memory into the BGR array PaddleOCR expects, so nothing is
+    written to disk. Images larger than MAX_SOURCE_PIXELS are rejected
+    with ValueError before decoding.
+    """
+    from tiling import check_pixels, open_image
+    if isinstance(source, str):
+        try:
+            with open_image(source) as image:
+                width, height = image.size
+        except OSError:
+            # Not a format Pillow reads; PaddleOCR reports it if it can't either
+            return source
+        check_pixels(width, height)
+        return source
+    import numpy as np
+    image = open_image(source)
+    check_pixels(*image.size)
+    return np.asarray(image.convert('RGB'))[:, :, ::-1]
+
+def source_name(source):
+    """Display name for a path, named file object or in-memory image"""
+    if isinstance(source, str):
+        return os.path.basename(source)
+    return getattr(source, 'name', None) or 'upload'
+
+def pdf_page_count(pdf_source):
+    """Number of pages in a PDF given as a path or as bytes"""
+    from pdf2image import pdfinfo_from_bytes, pdfinfo_from_path
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return pdfinfo_from_bytes(pdf_source)["Pages"]
+    return pdfinfo_from_path(pdf_source)["Pages"]
+
+def pdf_page_text(page_num, text):
+    """A page's text with the separator used in combined PDF text"""
+    return f"\n--- Page {page_num} ---\n{text}\n"
+
+def _to_box(points):
+    """Convert a polygon or [x0, y0, x1, y1] box to an axis-aligned box"""
+    if points is None:
+        return None
+    points = [list(p) if hasattr(p, '__iter__') else p for p in points]
+    if len(points) == 4 and not isinstance(points[0], list):
+        return [float(v) for v in points]
+    xs = [float(p[0]) for p in points]
+    ys = [float(p[1]) for p in points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+def extract_ocr_lines(result):
+    """
+    Flatten a PaddleOCR result into recognized lines with their boxes
+
+    Args:
+        result: Raw output of ocr_instance.predict() (new or old format)
+
+    Returns:
+        list: One dict per line with "text", "confidence" and "box"
+              ([x0, y0, x1, y1] in image pixels, or None if unavailable),
+              plus "tier" for results from the cascade (see cascade.py)
+    """
+    lines = []
+    if not result:
+        return lines
+
+    pages = result if isinstance(result, list) else [result]
+    for page in pages:
+        if isinstance(page, dict) or hasattr(page, 'keys'):
+            # New format: dictionary with rec_texts, rec_scores and boxes
+            texts = page.get('rec_texts') or []
+            scores = list(page.get('rec_scores', []))
+            boxes = page.get('rec_boxes')
+            if boxes is None or len(boxes) != len(texts):
+                boxes = page.get('rec_polys')
+            if boxes is None or len(boxes) != len(texts):
+                boxes = [None] * len(texts)
+            tiers = page.get('rec_tiers')
+            for i, text in enumerate(texts):
+                line = {
+                    "text": text,
+                    "confidence": float(scores[i]) if i < len(scores) else 0.0,
+                    "box": _to_box(boxes[i])
+                }
+                if tiers:
+                    line["tier"] = tiers[i]
+                lines.append(line)
+        elif page:
+            # Old format: list of [polygon, (text, confidence)]
+            for line in page:
+                if line and len(line) >= 2:
+                    lines.append({
+                        "text": line[1][0],
+                        "confidence": float(line[1][1]),
+                        "box": _to_box(line[0])
+                    })
+    return lines
+
+def process_image_ocr(image_path, ocr_instance=None, tiled=None, deadline=None, fast=False):
     """
     Process an image file with PaddleOCR and extract text
-    
+
     Args:
-        image_path (str): Path to the image file
+        image_path: Path to the image file, or a file object / PIL image
+                    to process in memory
         ocr_instance: Pre-initialized OCR instance (optional)
-    
+        tiled (bool): Force tiled processing on/off. By default large
+                      scans are tiled automatically (see tiling.py)
+        deadline (Deadline): Only used to stop tiled processing early
+        fast (bool): Skip text line orientation classification
+
     Returns:
         dict: Contains extracted text and metadata
     """
-    if not os.path.exists(image_path):
+    if isinstance(image_path, str) and not os.path.exists(image_path):
         raise FileNotFoundError(f"Image file not found: {image_path}")
-    
+
     if ocr_instance is None:
         ocr_instance = initialize_ocr()
-    
+
+    from tiling import needs_tiling, process_image_tiled
+    if tiled or (tiled is None and needs_tiling(image_path)):
+        return process_image_tiled(image_path, ocr_instance, deadline=deadline, fast=fast)
+
     try:
         # Perform OCR on the image using the new predict method
-        result = ocr_instance.predict(image_path)
+        ocr_input = load_ocr_input(image_path)
+        if fast:
+            result = ocr_instance.predict(ocr_input, use_textline_orientation=False)
+        else:
+            result = ocr_instance.predict(ocr_input)
         
         # Extract text from results (handle new PaddleOCR format)
         extracted_text = ""
@@ -92,7 +214,8 @@ def process_image_ocr(image_path, ocr_instance=None):
             "text": extracted_text.strip(),
             "confidence": round(avg_confidence, 3),
             "lines_detected": len(confidence_scores),
-            "filename": os.path.basename(image_path)
+            "lines": extract_ocr_lines(result),
+            "filename": source_name(image_path)
         }
         
     except Exception as e:
@@ -100,22 +223,70 @@ def process_image_ocr(image_path, ocr_instance=None):
             "success": False,
             "error": str(e),
             "text": "",
-            "filename": os.path.basename(image_path)
+            "filename": source_name(image_path)
         }
 
-def process_pdf_ocr(pdf_path, ocr_instance=None):
+def iter_pdf_pages(pdf_source, ocr_instance, page_count, deadline=None):
+    """
+    Render and recognize a PDF one page at a time (requires pdf2image)
+
+    When a deadline is given, no page is started unless it is expected to
+    finish in time, and orientation classification is skipped once time
+    runs short.
+
+    Args:
+        pdf_source: Path to the PDF file, or the PDF as bytes
+        ocr_instance: Pre-initialized OCR instance
+        page_count (int): Number of pages in the PDF
+        deadline (Deadline): When the caller stops waiting (optional)
+
+    Yields:
+        tuple: (page number, process_image_ocr() result for that page)
+    """
+    from pdf2image import convert_from_bytes, convert_from_path
+    convert = convert_from_bytes if isinstance(pdf_source, (bytes, bytearray)) else convert_from_path
+
+    deadline = deadline or NO_DEADLINE
+    pages_processed = 0
+    page_time = None  # running average seconds per page
+
+    for page_num in range(1, page_count + 1):
+        # Don't start a page whose result would arrive too late
+        if deadline.expired() or not deadline.can_afford(page_time):
+            return
+        page_start = time.monotonic()
+
+        # Convert only this page to an image and recognize it in memory
+        image = convert(pdf_source, first_page=page_num, last_page=page_num)[0]
+        try:
+            result = process_image_ocr(image, ocr_instance, deadline=deadline,
+                                       fast=deadline.under_pressure(page_time))
+        finally:
+            image.close()
+
+        pages_processed += 1
+        elapsed = time.monotonic() - page_start
+        page_time = elapsed if page_time is None else page_time + (elapsed - page_time) / pages_processed
+
+        yield page_num, result
+
+def process_pdf_ocr(pdf_source, ocr_instance=None, deadline=None):
     """
     Process a PDF file with PaddleOCR (requires pdf2image)
-    
+
+    Pages are processed by iter_pdf_pages(). If the deadline runs out, the
+    pages done so far are returned with "partial": True.
+
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_source: Path to the PDF file, or the PDF as bytes
         ocr_instance: Pre-initialized OCR instance (optional)
-    
+        deadline (Deadline): When the caller stops waiting (optional)
+
     Returns:
         dict: Contains extracted text from all pages
     """
     try:
-        from pdf2image import convert_from_path
+        import pdf2image
         PDF2IMAGE_AVAILABLE = True
     except ImportError:
         PDF2IMAGE_AVAILABLE = False
@@ -125,49 +296,43 @@ def process_pdf_ocr(pdf_path, ocr_instance=None):
             "text": ""
         }
     
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    if isinstance(pdf_source, str) and not os.path.exists(pdf_source):
+        raise FileNotFoundError(f"PDF file not found: {pdf_source}")
     
     if ocr_instance is None:
         ocr_instance = initialize_ocr()
     
     try:
-        # Convert PDF to images
-        images = convert_from_path(pdf_path)
-        
+        page_count = pdf_page_count(pdf_source)
+
         all_text = ""
         total_confidence = 0
         total_lines = 0
-        
-        for page_num, image in enumerate(images, 1):
-            # Save temporary image
-            temp_image_path = f"temp_page_{page_num}.png"
-            image.save(temp_image_path, 'PNG')
-            
-            try:
-                # Process each page
-                result = process_image_ocr(temp_image_path, ocr_instance)
-                
-                if result["success"]:
-                    all_text += f"\n--- Page {page_num} ---\n"
-                    all_text += result["text"] + "\n"
-                    total_confidence += result["confidence"] * result["lines_detected"]
-                    total_lines += result["lines_detected"]
-                
-            finally:
-                # Clean up temporary image
-                if os.path.exists(temp_image_path):
-                    os.remove(temp_image_path)
-        
+        pages_processed = 0
+        truncated = False  # a page was cut short by the deadline
+        lines = []
+
+        for page_num, result in iter_pdf_pages(pdf_source, ocr_instance, page_count, deadline):
+            pages_processed += 1
+            if result["success"]:
+                lines.extend(dict(line, page=page_num) for line in result.get("lines", []))
+                all_text += pdf_page_text(page_num, result["text"])
+                total_confidence += result["confidence"] * result["lines_detected"]
+                total_lines += result["lines_detected"]
+                truncated = truncated or result.get("partial", False)
+
         avg_confidence = total_confidence / total_lines if total_lines > 0 else 0
-        
+
         return {
             "success": True,
             "text": all_text.strip(),
             "confidence": round(avg_confidence, 3),
-            "pages_processed": len(images),
+            "pages_processed": pages_processed,
+            "pages_total": page_count,
+            "partial": truncated or pages_processed < page_count,
             "lines_detected": total_lines,
-            "filename": os.path.basename(pdf_path)
+            "lines": lines,
+            "filename": source_name(pdf_source) if isinstance(pdf_source, str) else "upload.pdf"
         }
         
     except Exception as e:
@@ -175,16 +340,18 @@ def process_pdf_ocr(pdf_path, ocr_instance=None):
             "success": False,
             "error": str(e),
             "text": "",
-            "filename": os.path.basename(pdf_path)
+            "filename": source_name(pdf_source) if isinstance(pdf_source, str) else "upload.pdf"
         }
 
 def main():
     """Main function for command-line usage"""
-    if len(sys.argv) != 2:
-        print("Usage: python paddle_ocr.py <image_or_pdf_path>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python paddle_ocr.py <image_or_pdf_path> [timeout_seconds]")
         sys.exit(1)
-    
+
     file_path = sys.argv[1]
+    # Return whatever is done before the caller's timeout kills us
+    deadline = Deadline(float(sys.argv[2])) if len(sys.argv) == 3 else None
     
     if not PADDLEOCR_AVAILABLE:
         # Return mock data for demonstration
@@ -207,9 +374,9 @@ def main():
         file_extension = Path(file_path).suffix.lower()
         
         if file_extension == '.pdf':
-            result = process_pdf_ocr(file_path, ocr)
+            result = process_pdf_ocr(file_path, ocr, deadline=deadline)
         else:
-            result = process_image_ocr(file_path, ocr)
+            result = process_image_ocr(file_path, ocr, deadline=deadline)
         
         # Output result as JSON
         print(json.dumps(result))
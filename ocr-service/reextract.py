@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Re-run field extraction over the OCR archive
+
+Applies the current extract_medical_data() to every archived record whose
+extractorVersion is older than EXTRACTOR_VERSION, using the stored text
+instead of running OCR again. Records are processed in parallel across
+all cores.
+
+Usage: python reextract.py [--archive DIR] [--workers N] [--force]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from multiprocessing import Pool
+
+from extraction import EXTRACTOR_VERSION, extract_medical_data
+from ocr_archive import ARCHIVE_DIR, iter_record_paths, write_record
+
+def reextract_record(path, force=False):
+    """
+    Update one archived record if its extractor version is stale
+
+    Returns:
+        str: "current", "unchanged", "changed" or "failed"
+    """
+    try:
+        with open(path) as f:
+            record = json.load(f)
+        if not force and record.get("extractorVersion", 0) >= EXTRACTOR_VERSION:
+            return "current"
+
+        structured_data = extract_medical_data(record["text"])
+        status = "unchanged" if structured_data == record.get("structuredData") else "changed"
+        record["structuredData"] = structured_data
+        record["extractorVersion"] = EXTRACTOR_VERSION
+        record["reextracted"] = datetime.now().isoformat()
+        write_record(path, record)
+        return status
+    except Exception as e:
+        print(f"Failed to re-extract {path}: {e}", file=sys.stderr)
+        return "failed"
+
+def _reextract(args):
+    return reextract_record(*args)
+
+def main():
+    """Main function for command-line usage"""
+    parser = argparse.ArgumentParser(description="Re-apply field extraction to archived OCR results")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="archive directory (default: OCR_ARCHIVE_DIR)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-extract records that are already current")
+    args = parser.parse_args()
+
+    if not args.archive or not os.path.isdir(args.archive):
+        print(f"Archive directory not found: {args.archive}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    jobs = ((path, args.force) for path in iter_record_paths(args.archive))
+    with Pool(args.workers) as pool:
+        counts = Counter(pool.imap_unordered(_reextract, jobs, chunksize=256))
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    print(json.dumps({
+        "extractorVersion": EXTRACTOR_VERSION,
+        "records": total,
+        **counts,
+        "seconds": round(elapsed, 2),
+        "records_per_second": round(total / elapsed) if elapsed else total
+    }))
+    if counts["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
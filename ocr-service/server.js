@@ -7,6 +7,7 @@ const path = require('path');
 
 const app = express();
 const PORT = 3002;
+const OCR_TIMEOUT_MS = 60000;
 
 // Enable CORS for all routes
 app.use(cors({
@@ -133,8 +134,9 @@ function performPythonOCR(imagePath) {
   return new Promise((resolve, reject) => {
     console.log('🐍 Using Python OCR script:', imagePath);
 
-    // Use the standalone Python OCR script
-    const pythonProcess = spawn('python3', ['paddle_ocr.py', imagePath]);
+    // Use the standalone Python OCR script. It gets a slightly shorter
+    // budget than our timeout so it can return partial results in time.
+    const pythonProcess = spawn('python3', ['paddle_ocr.py', imagePath, String(OCR_TIMEOUT_MS / 1000 - 5)]);
 
     let output = '';
     let error = '';
@@ -171,8 +173,8 @@ function performPythonOCR(imagePath) {
     // Add timeout
     setTimeout(() => {
       pythonProcess.kill();
-      reject(new Error('Python OCR timeout after 60 seconds'));
-    }, 60000);
+      reject(new Error(`Python OCR timeout after ${OCR_TIMEOUT_MS / 1000} seconds`));
+    }, OCR_TIMEOUT_MS);
   });
 }
 
@@ -24,4 +24,4 @@ pip install -r requirements.txt
 
 # Start the service
 echo "Starting OCR service on port 3001..."
-python app.py
+gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,98 @@
+"""
+Tests for merging tiled OCR results.
+
+Run with: python -m pytest test_tiling.py
+"""
+
+from PIL import Image
+
+from tiling import dedupe_lines, reading_order, recognize_tiled, stitch_lines, tile_origins
+
+
+def line(text, box, confidence=0.9):
+    return {"text": text, "confidence": confidence, "box": box}
+
+
+class StubEngine:
+    """Returns the characters of one line that fall fully inside each tile"""
+
+    def __init__(self, text, box, origins):
+        self.text = text
+        self.box = box
+        self.origins = iter(origins)
+
+    def predict(self, tile, **kwargs):
+        x = next(self.origins)
+        width = tile.shape[1]
+        x0, y0, x1, y1 = self.box
+        char_width = (x1 - x0) / len(self.text)
+        chars = [i for i in range(len(self.text))
+                 if x0 + i * char_width >= x and x0 + (i + 1) * char_width <= x + width]
+        if not chars:
+            return [{"rec_texts": [], "rec_scores": [], "rec_boxes": []}]
+        first, last = chars[0], chars[-1]
+        return [{
+            "rec_texts": [self.text[first:last + 1]],
+            "rec_scores": [0.9],
+            "rec_boxes": [[x0 + first * char_width - x, y0, x0 + (last + 1) * char_width - x, y1]]
+        }]
+
+
+def test_dedupe_keeps_longest_copy_from_overlap():
+    lines = dedupe_lines([
+        line("Glucose: 95", [100, 10, 300, 30]),
+        line("Glucose: 95 mg/dL", [100, 10, 420, 30]),
+    ])
+    assert [l["text"] for l in lines] == ["Glucose: 95 mg/dL"]
+
+
+def test_dedupe_keeps_separate_lines():
+    lines = dedupe_lines([
+        line("Glucose: 95 mg/dL", [100, 10, 420, 30]),
+        line("Glucose: 95 mg/dL", [100, 200, 420, 230]),
+    ])
+    assert len(lines) == 2
+
+
+def test_stitch_joins_seam_crossing_line():
+    lines = stitch_lines([
+        line("Patient Name Joh", [1500, 100, 2048, 130]),
+        line("ohn Doe", [1792, 100, 2100, 130], confidence=0.8),
+    ])
+    assert len(lines) == 1
+    assert lines[0]["text"] == "Patient Name John Doe"
+    assert lines[0]["box"] == [1500, 100, 2100, 130]
+    assert lines[0]["confidence"] == 0.8
+
+
+def test_stitch_leaves_other_rows_alone():
+    lines = stitch_lines([
+        line("Patient Name Joh", [1500, 100, 2048, 130]),
+        line("ohn Doe", [1792, 300, 2100, 330]),
+        line("Date: 2024", [2200, 100, 2400, 130]),
+    ])
+    assert len(lines) == 3
+
+
+def test_reading_order():
+    lines = reading_order([
+        line("second", [10, 52, 100, 70]),
+        line("right", [300, 11, 400, 29]),
+        line("left", [10, 10, 100, 30]),
+        line("no box", None),
+    ])
+    assert [l["text"] for l in lines] == ["left", "right", "second", "no box"]
+
+
+def test_recognize_tiled_line_wider_than_overlap():
+    text = "Patient Name John Doe"
+    box = [1500, 100, 2600, 130]
+    image = Image.new("RGB", (4000, 600), "white")
+    engine = StubEngine(text, box, tile_origins(4000))
+
+    lines, tiles_done = recognize_tiled(image, engine)
+
+    assert tiles_done == len(tile_origins(4000))
+    assert [l["text"] for l in lines] == [text]
+    assert lines[0]["box"][0] == box[0]
+    assert abs(lines[0]["box"][2] - box[2]) < 1e-6
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Tiled OCR for very large scans
+
+Flatbed scans and stitched photos can be tens of megapixels, which is far
+more than PaddleOCR needs per pass. Large images are cut into overlapping
+tiles, each tile is recognized on its own, and the lines are merged back
+into page coordinates with duplicates from the overlaps removed. Lines
+wider than the overlap are never seen whole by one tile; their pieces
+are stitched back together on the text both tiles read in the overlap.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from deadline import NO_DEADLINE
+
+# Images above this many pixels are tiled automatically
+TILE_THRESHOLD_PIXELS = 12_000_000
+# Tile edge length and overlap between neighbouring tiles, in pixels
+TILE_SIZE = 2048
+TILE_OVERLAP = 256
+# Hard ceiling on decoded source pixels. Larger images are decoded at a
+# reduced scale (JPEG) or rejected, so memory stays bounded. Pillow's own
+# decompression bomb limit (Image.MAX_IMAGE_PIXELS) is never changed.
+MAX_SOURCE_PIXELS = 150_000_000
+
+def open_image(image_path):
+    """Open an image lazily (header only), or pass a PIL image through"""
+    from PIL import Image
+
+    if isinstance(image_path, Image.Image):
+        return image_path
+    try:
+        return Image.open(image_path)
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"Image is too large to process: {e}")
+
+def _open_large_jpeg(image_path, error):
+    """
+    Open a JPEG that Pillow refused as a decompression bomb
+
+    The header is read without Pillow's size check; callers must draft it
+    down and check the decoded size before loading any pixel data.
+    """
+    from PIL import JpegImagePlugin
+
+    if hasattr(image_path, 'seek'):
+        image_path.seek(0)
+    try:
+        return JpegImagePlugin.JpegImageFile(image_path)
+    except SyntaxError:
+        # Not a JPEG, so it can't be decoded at a reduced scale
+        raise error
+
+def check_pixels(width, height, max_pixels=MAX_SOURCE_PIXELS):
+    """Raise ValueError if an image is larger than max_pixels"""
+    if width * height > max_pixels:
+        raise ValueError(
+            f"Image is too large to process ({width}x{height}); "
+            f"limit is {max_pixels} pixels"
+        )
+
+def needs_tiling(image_path, threshold=TILE_THRESHOLD_PIXELS):
+    """Check the image header (without decoding) to see if it should be tiled"""
+    from PIL import Image
+    if isinstance(image_path, Image.Image):
+        width, height = image_path.size
+        return width * height > threshold
+    try:
+        with open_image(image_path) as img:
+            width, height = img.size
+    except ValueError:
+        # Refused as a decompression bomb; open_bounded reports the error
+        return True
+    except Exception:
+        return False
+    finally:
+        if hasattr(image_path, 'seek'):
+            image_path.seek(0)
+    return width * height > threshold
+
+def open_bounded(image_path, max_pixels=MAX_SOURCE_PIXELS):
+    """
+    Open an image for tiling without exceeding max_pixels once decoded
+
+    Args:
+        image_path: Path, file object or already decoded PIL image
+
+    Returns:
+        tuple: (RGB PIL image, scale factor from source to decoded pixels)
+    """
+    try:
+        img = open_image(image_path)
+    except ValueError as e:
+        img = _open_large_jpeg(image_path, e)
+    width, height = img.size
+    scale = 1.0
+    if width * height > max_pixels:
+        # JPEG can be decoded directly at 1/2, 1/4 or 1/8 scale
+        ratio = (max_pixels / float(width * height)) ** 0.5
+        img.draft('RGB', (int(width * ratio), int(height * ratio)))
+        if img.size[0] * img.size[1] > max_pixels:
+            # Not a JPEG, or still too large at 1/8 scale
+            img.close()
+            check_pixels(width, height, max_pixels)
+        scale = img.size[0] / float(width)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img, scale
+
+def tile_origins(length, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Start offsets along one axis so tiles cover [0, length) with overlap"""
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+def iter_tiles(image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Yield (x, y, tile) for overlapping tiles, row by row"""
+    width, height = image.size
+    for y in tile_origins(height, tile_size, overlap):
+        for x in tile_origins(width, tile_size, overlap):
+            yield x, y, image.crop((x, y, min(x + tile_size, width), min(y + tile_size, height)))
+
+def _normalize(text):
+    return "".join(text.lower().split())
+
+def _overlap_ratio(a, b):
+    """Intersection area divided by the smaller box's area"""
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (ix * iy) / smaller if smaller > 0 else 0.0
+
+def _is_duplicate(a, b, min_overlap=0.5):
+    """Two lines are the same text seen from two tiles"""
+    if a["box"] is None or b["box"] is None:
+        return False
+    if _overlap_ratio(a["box"], b["box"]) < min_overlap:
+        return False
+    ta, tb = _normalize(a["text"]), _normalize(b["text"])
+    # A line narrower than the overlap is seen whole by one tile, and the
+    # copy cut at the other tile's edge is a prefix/suffix of it. Wider
+    # lines are split into pieces that stitch_lines() joins instead.
+    return ta == tb or ta in tb or tb in ta
+
+def dedupe_lines(lines):
+    """Drop lines recognized twice in tile overlaps, keeping the best copy"""
+    kept = []
+    # Longer, more confident lines win over fragments cut at tile edges
+    for line in sorted(lines, key=lambda l: (len(l["text"]), l["confidence"]), reverse=True):
+        if not any(_is_duplicate(line, other) for other in kept):
+            kept.append(line)
+    return kept
+
+def _same_row(a, b):
+    """Boxes share at least half the height of the shorter one"""
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    return iy > 0.5 * min(a[3] - a[1], b[3] - b[1])
+
+def _text_overlap(left, right, min_chars=2):
+    """Length of the longest suffix of left that is a prefix of right"""
+    left, right = left.lower(), right.lower()
+    for k in range(min(len(left), len(right)), min_chars - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+def _stitch(left, right):
+    """Join two pieces of one line, or None if their texts don't overlap"""
+    k = _text_overlap(left["text"], right["text"])
+    if not k:
+        return None
+    a, b = left["box"], right["box"]
+    return dict(
+        left,
+        text=left["text"] + right["text"][k:],
+        confidence=min(left["confidence"], right["confidence"]),
+        box=[a[0], min(a[1], b[1]), b[2], max(a[3], b[3])]
+    )
+
+def stitch_lines(lines):
+    """
+    Join pieces of lines that crossed a vertical tile seam
+
+    Two pieces are joined when they sit in the same row, overlap
+    horizontally (both tiles saw the overlap strip), the right piece
+    extends further right, and the end of the left text matches the start
+    of the right text. A line crossing several seams is joined pairwise.
+    """
+    boxed = sorted((l for l in lines if l["box"] is not None), key=lambda l: l["box"][0])
+    unboxed = [l for l in lines if l["box"] is None]
+    joined = True
+    while joined:
+        joined = False
+        for i, left in enumerate(boxed):
+            for j in range(i + 1, len(boxed)):
+                right = boxed[j]
+                a, b = left["box"], right["box"]
+                if b[0] >= a[2] or b[2] <= a[2] or not _same_row(a, b):
+                    continue
+                stitched = _stitch(left, right)
+                if stitched is not None:
+                    boxed[i] = stitched
+                    del boxed[j]
+                    joined = True
+                    break
+            if joined:
+                break
+    return boxed + unboxed
+
+def reading_order(lines):
+    """Sort lines top-to-bottom, then left-to-right within each text row"""
+    boxed = [l for l in lines if l["box"] is not None]
+    if not boxed:
+        return list(lines)
+    heights = sorted(l["box"][3] - l["box"][1] for l in boxed)
+    row_tolerance = max(heights[len(heights) // 2] / 2.0, 1.0)
+
+    rows = []
+    for line in sorted(boxed, key=lambda l: (l["box"][1] + l["box"][3]) / 2.0):
+        center = (line["box"][1] + line["box"][3]) / 2.0
+        if rows and abs(center - rows[-1][0]) <= row_tolerance:
+            rows[-1][1].append(line)
+        else:
+            rows.append([center, [line]])
+
+    ordered = []
+    for _, row in rows:
+        ordered.extend(sorted(row, key=lambda l: l["box"][0]))
+    return ordered + [l for l in lines if l["box"] is None]
+
+def _recognize_tile(engines, x, y, tile, scale, predict_kwargs):
+    """Run OCR on one tile and map its boxes back to source image pixels"""
+    import numpy as np
+    from paddle_ocr import extract_ocr_lines
+
+    engine = engines.get()
+    try:
+        # PaddleOCR expects BGR arrays
+        result = engine.predict(np.asarray(tile)[:, :, ::-1], **predict_kwargs)
+    finally:
+        engines.put(engine)
+        tile.close()
+
+    lines = extract_ocr_lines(result)
+    for line in lines:
+        if line["box"] is not None:
+            x0, y0, x1, y1 = line["box"]
+            line["box"] = [(x0 + x) / scale, (y0 + y) / scale, (x1 + x) / scale, (y1 + y) / scale]
+    return lines
+
+def recognize_tiled(image, ocr_instance, scale=1.0, tile_size=TILE_SIZE,
+                    overlap=TILE_OVERLAP, workers=1, deadline=None, fast=False):
+    """
+    Recognize an already opened image tile by tile
+
+    Args:
+        image: RGB PIL image
+        ocr_instance: An OCR engine, or a list of engines to run tiles in
+                      parallel (one engine per worker thread). The OCR
+                      service passes its single pooled engine, so tiles of
+                      one request run sequentially there.
+        scale (float): Decoded pixels per source pixel (from open_bounded)
+        workers (int): Number of tiles recognized concurrently
+        deadline (Deadline): Stop starting new tiles once it has expired
+        fast (bool): Skip text line orientation classification
+
+    Returns:
+        tuple: (merged, de-duplicated and stitched lines in reading order,
+                tiles done)
+    """
+    deadline = deadline or NO_DEADLINE
+    predict_kwargs = {"use_textline_orientation": False} if fast else {}
+    engines = queue.Queue()
+    for engine in (ocr_instance if isinstance(ocr_instance, (list, tuple)) else [ocr_instance]):
+        engines.put(engine)
+    workers = max(1, min(workers, engines.qsize()))
+
+    lines = []
+    tiles_done = 0
+    tiles = iter_tiles(image, tile_size, overlap)
+    if workers == 1:
+        for x, y, tile in tiles:
+            if deadline.expired():
+                tile.close()
+                break
+            lines.extend(_recognize_tile(engines, x, y, tile, scale, predict_kwargs))
+            tiles_done += 1
+    else:
+        # Never hold more than `workers` cropped tiles in memory at once
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for x, y, tile in tiles:
+                if len(pending) >= workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        lines.extend(future.result())
+                        tiles_done += 1
+                if deadline.expired():
+                    tile.close()
+                    break
+                pending.add(executor.submit(_recognize_tile, engines, x, y, tile, scale, predict_kwargs))
+            for future in pending:
+                lines.extend(future.result())
+                tiles_done += 1
+
+    return reading_order(stitch_lines(dedupe_lines(lines))), tiles_done
+
+def process_image_tiled(image_path, ocr_instance, tile_size=TILE_SIZE,
+                        overlap=TILE_OVERLAP, workers=1, deadline=None, fast=False):
+    """
+    Process a large image file tile by tile
+
+    Returns:
+        dict: Same shape as process_image_ocr(), plus "tiles", "lines" and
+              "partial" (True if the deadline stopped it before the last tile)
+    """
+    from paddle_ocr import source_name
+
+    start_time = datetime.now()
+    try:
+        image, scale = open_bounded(image_path)
+        try:
+            width, height = image.size
+            tile_count = len(tile_origins(width, tile_size, overlap)) * len(tile_origins(height, tile_size, overlap))
+            lines, tiles_done = recognize_tiled(image, ocr_instance, scale, tile_size, overlap,
+                                                workers, deadline, fast)
+        finally:
+            image.close()
+
+        confidence_scores = [line["confidence"] for line in lines]
+        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
+
+        return {
+            "success": True,
+            "text": "\n".join(line["text"] for line in lines).strip(),
+            "confidence": round(avg_confidence, 3),
+            "lines_detected": len(lines),
+            "lines": lines,
+            "tiles": tile_count,
+            "partial": tiles_done < tile_count,
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "filename": source_name(image_path)
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "text": "",
+            "filename": source_name(image_path)
+        }
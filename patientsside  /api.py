@@ -1,11 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import joblib
+import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
+from feature_store import FeatureStore, MissingFeatures, UnknownPatient, MODEL_FEATURES
+import os
+import sys
+
+# Shared helpers for the Python services live in ../shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from profiling import init_fastapi, profiled
+from input_monitor import InputMonitor
 
 # Load model
 model = joblib.load("patient_fasting_model.pkl")
 
+# Input/score drift monitoring against the training data
+MONITORED_FEATURES = ["age", "bmi", "cholesterol", "prev_fasting", "bp"]
+training_data = pd.read_csv("patient_data.csv")
+monitor = InputMonitor.from_training(training_data, MONITORED_FEATURES, model.predict(training_data[MODEL_FEATURES]))
+
+# Rolling per-patient features, updated as readings arrive. In memory only:
+# empty after a restart until readings are posted again (see feature_store.py)
+feature_store = FeatureStore()
+
 # Create FastAPI app
 app = FastAPI()
 
@@ -18,6 +37,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (PROFILE_SAMPLE_RATE, or X-Profile with PROFILE_HEADER_ENABLED=1)
+init_fastapi(app, "patient")
+
 # Define input data structure
 class PatientData(BaseModel):
     age: int
@@ -29,6 +51,7 @@ class PatientData(BaseModel):
 
 # Endpoint to get prediction
 @app.post("/predict")
+@profiled
 def predict(data: PatientData):
     input_df = [[
         data.age,
@@ -39,4 +62,57 @@ def predict(data: PatientData):
         data.smoking
     ]]
     prediction = model.predict(input_df)
-    return {"predicted_future_fasting": prediction[0]}
\ No newline at end of file
+    monitor.observe({name: getattr(data, name) for name in MONITORED_FEATURES}, prediction[0])
+    return {"predicted_future_fasting": prediction[0]}
+
+# Incoming reading for the feature store (any subset of fields)
+class PatientReading(BaseModel):
+    fasting: Optional[float] = None
+    bp: Optional[float] = None
+    bmi: Optional[float] = None
+    age: Optional[int] = None
+    cholesterol: Optional[float] = None
+    smoking: Optional[int] = None
+
+# OCR result forwarded from the OCR service
+class OCRReading(BaseModel):
+    structuredData: dict
+
+@app.post("/patients/{patient_id}/readings")
+@profiled
+def add_reading(patient_id: str, reading: PatientReading):
+    features = feature_store.update(patient_id, **reading.dict())
+    return {"patient_id": patient_id, "features": features}
+
+@app.post("/patients/{patient_id}/ocr")
+@profiled
+def add_ocr_reading(patient_id: str, reading: OCRReading):
+    features = feature_store.update_from_ocr(patient_id, reading.structuredData)
+    return {"patient_id": patient_id, "features": features}
+
+@app.get("/patients/{patient_id}/features")
+@profiled
+def get_features(patient_id: str):
+    features = feature_store.get(patient_id)
+    if features is None:
+        raise HTTPException(status_code=404, detail=f"No readings for patient {patient_id}")
+    return {"patient_id": patient_id, "features": features}
+
+# Predict from stored features, no client-side feature computation needed
+@app.post("/predict/{patient_id}")
+@profiled
+def predict_for_patient(patient_id: str):
+    try:
+        input_row = feature_store.model_input(patient_id)
+    except UnknownPatient:
+        raise HTTPException(status_code=404, detail=f"No readings for patient {patient_id}")
+    except MissingFeatures as e:
+        raise HTTPException(status_code=422, detail=f"Missing features for patient {patient_id}: {e}")
+    prediction = model.predict([input_row])
+    monitor.observe(dict(zip(MODEL_FEATURES, input_row)), prediction[0])
+    return {"patient_id": patient_id, "predicted_future_fasting": prediction[0]}
+
+# Live input and prediction distributions compared to the training data
+@app.get("/monitoring")
+def monitoring():
+    return {"features": monitor.report()}
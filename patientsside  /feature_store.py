@@ -0,0 +1,160 @@
+"""
+Per-patient feature store for the fasting prediction model.
+
+Readings are folded into rolling aggregates as they arrive, so a
+prediction only needs the patient id and a dictionary lookup instead of
+the caller recomputing features from the full HealthData history.
+
+The store lives in process memory only. After a restart it is empty and
+/predict/{patient_id} returns 404 until readings are posted again;
+nothing in the Node backend re-sends them yet.
+"""
+
+import re
+import threading
+from collections import deque
+
+# Number of most recent fasting readings kept for the rolling mean/trend
+WINDOW = 10
+
+# Features in the order the model was trained on (see patient_model.py)
+MODEL_FEATURES = ["age", "bmi", "cholesterol", "prev_fasting", "bp", "smoking"]
+
+# Plausible ranges for values read by OCR; anything outside is a misread
+# (e.g. a date such as 12/05/2024 matching the blood pressure pattern)
+OCR_BOUNDS = {
+    "fasting": (40, 600),       # mg/dL
+    "bp": (70, 250),            # systolic mmHg
+    "bmi": (10, 80),
+    "cholesterol": (50, 600),   # mg/dL
+}
+
+
+class UnknownPatient(Exception):
+    """No readings have been recorded for the patient."""
+
+
+class MissingFeatures(Exception):
+    """The patient has readings, but not every model feature yet."""
+
+    def __init__(self, missing):
+        super().__init__(", ".join(missing))
+        self.missing = missing
+
+
+class PatientFeatures:
+    """Rolling aggregates for a single patient, updated in O(1) per reading."""
+
+    def __init__(self, window=WINDOW):
+        self.fasting = deque(maxlen=window)
+        self.fasting_sum = 0.0
+        self.fasting_count = 0
+        self.fasting_trend = 0.0
+        self.values = {}
+
+    def add_fasting(self, value):
+        if len(self.fasting) == self.fasting.maxlen:
+            self.fasting_sum -= self.fasting[0]
+        self.fasting.append(value)
+        self.fasting_sum += value
+        self.fasting_count += 1
+        self.values["prev_fasting"] = value
+        self.fasting_trend = self._slope()
+
+    def _slope(self):
+        """Least-squares change in fasting glucose per reading over the window"""
+        n = len(self.fasting)
+        if n < 2:
+            return 0.0
+        mean_x = (n - 1) / 2.0
+        mean_y = self.fasting_sum / n
+        num = sum((i - mean_x) * (y - mean_y) for i, y in enumerate(self.fasting))
+        den = sum((i - mean_x) ** 2 for i in range(n))
+        return num / den
+
+    def snapshot(self):
+        n = len(self.fasting)
+        return {
+            **self.values,
+            "fasting_mean": round(self.fasting_sum / n, 2) if n else None,
+            "fasting_trend": round(self.fasting_trend, 3),
+            "fasting_readings": self.fasting_count,
+        }
+
+    def model_input(self):
+        """Feature row for the model, or raise MissingFeatures naming what is missing"""
+        missing = [name for name in MODEL_FEATURES if name not in self.values]
+        if missing:
+            raise MissingFeatures(missing)
+        return [self.values[name] for name in MODEL_FEATURES]
+
+
+class FeatureStore:
+    """Thread-safe map of patient id -> PatientFeatures."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._patients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, patient_id):
+        features = self._patients.get(patient_id)
+        if features is None:
+            features = self._patients[patient_id] = PatientFeatures(self.window)
+        return features
+
+    def update(self, patient_id, fasting=None, bp=None, bmi=None,
+               age=None, cholesterol=None, smoking=None):
+        """Record a new reading; any field left as None is unchanged."""
+        with self._lock:
+            features = self._get(patient_id)
+            if fasting is not None:
+                features.add_fasting(float(fasting))
+            for name, value in (("bp", bp), ("bmi", bmi), ("cholesterol", cholesterol)):
+                if value is not None:
+                    features.values[name] = float(value)
+            for name, value in (("age", age), ("smoking", smoking)):
+                if value is not None:
+                    features.values[name] = int(value)
+            return features.snapshot()
+
+    def update_from_ocr(self, patient_id, structured_data):
+        """Record the readings found in an OCR `structuredData` dictionary."""
+        return self.update(patient_id, **parse_structured_data(structured_data))
+
+    def get(self, patient_id):
+        with self._lock:
+            features = self._patients.get(patient_id)
+            return features.snapshot() if features else None
+
+    def model_input(self, patient_id):
+        with self._lock:
+            features = self._patients.get(patient_id)
+            if features is None:
+                raise UnknownPatient(patient_id)
+            return features.model_input()
+
+
+def _number(value):
+    match = re.search(r"\d+(?:\.\d+)?", str(value))
+    return float(match.group(0)) if match else None
+
+
+def parse_structured_data(structured_data):
+    """Map OCR structuredData (e.g. "95 mg/dL", "120/80") to store fields.
+
+    Values outside OCR_BOUNDS are dropped.
+    """
+    fields = {}
+    if structured_data.get("glucose"):
+        fields["fasting"] = _number(structured_data["glucose"])
+    if structured_data.get("blood_pressure"):
+        # The model's bp feature is the systolic reading
+        fields["bp"] = _number(str(structured_data["blood_pressure"]).split("/")[0])
+    for name in ("bmi", "cholesterol"):
+        if structured_data.get(name):
+            fields[name] = _number(structured_data[name])
+    return {
+        name: value for name, value in fields.items()
+        if value is not None and OCR_BOUNDS[name][0] <= value <= OCR_BOUNDS[name][1]
+    }
@@ -1,7 +1,15 @@
+import argparse
+import os
+import sys
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 import joblib
 
+parser = argparse.ArgumentParser(description="Train the future fasting glucose model")
+parser.add_argument("--tune", action="store_true",
+                    help="cross-validated search over regularization, solvers and other estimators")
+args = parser.parse_args()
+
 # Load data
 data = pd.read_csv("patient_data.csv")
 
@@ -9,9 +17,32 @@ data = pd.read_csv("patient_data.csv")
 X = data[["age", "bmi", "cholesterol", "prev_fasting", "bp", "smoking"]]
 y = data["future_fasting"]
 
-# Train model
-model = LinearRegression()
-model.fit(X, y)
+if args.tune:
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import ElasticNet, Ridge, SGDRegressor
+    from sklearn.model_selection import KFold
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+    from model_selection import tune_model
+
+    candidates = [
+        (LinearRegression(), {}),
+        (Ridge(), {"alpha": [0.01, 0.1, 1, 10, 100], "solver": ["auto", "cholesky", "lsqr", "sag"]}),
+        (ElasticNet(max_iter=10000), {"alpha": [0.01, 0.1, 1, 10], "l1_ratio": [0.2, 0.5, 0.8]}),
+        (SGDRegressor(random_state=42), {"alpha": [1e-5, 1e-4, 1e-3], "penalty": ["l2", "elasticnet"]}),
+        (HistGradientBoostingRegressor(random_state=42), {"learning_rate": [0.05, 0.1], "max_depth": [3, None]}),
+    ]
+    folds = KFold(n_splits=min(5, len(y)), shuffle=True, random_state=42)
+    model, report = tune_model(X, y, candidates, folds,
+                               scoring={"neg_mae": "neg_mean_absolute_error", "r2": "r2"},
+                               refit="neg_mae", report_path="patient_fasting_model_report.json")
+    print(f"✅ Searched {report['candidates']} candidates in {report['search_seconds']}s, "
+          f"best: {report['best_estimator']} {report['best_params']} {report['best_score']}")
+    print("✅ Report saved as patient_fasting_model_report.json")
+else:
+    # Train model
+    model = LinearRegression()
+    model.fit(X, y)
 
 # Save model
 joblib.dump(model, "patient_fasting_model.pkl")
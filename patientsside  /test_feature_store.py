@@ -0,0 +1,92 @@
+"""
+Tests for the per-patient feature store.
+
+Run with: python -m pytest test_feature_store.py
+"""
+
+import pytest
+
+from feature_store import (
+    FeatureStore, MissingFeatures, UnknownPatient, PatientFeatures, parse_structured_data
+)
+
+
+def full_reading(store, patient_id="p1", fasting=100):
+    return store.update(patient_id, fasting=fasting, bp=120, bmi=27.5,
+                        age=54, cholesterol=190, smoking=0)
+
+
+def test_model_input_in_training_order():
+    store = FeatureStore()
+    full_reading(store)
+    assert store.model_input("p1") == [54, 27.5, 190.0, 100.0, 120.0, 0]
+
+
+def test_unknown_patient():
+    store = FeatureStore()
+    with pytest.raises(UnknownPatient):
+        store.model_input("nobody")
+    assert store.get("nobody") is None
+
+
+def test_missing_features_are_named():
+    store = FeatureStore()
+    store.update("p1", fasting=100)
+    with pytest.raises(MissingFeatures) as excinfo:
+        store.model_input("p1")
+    assert excinfo.value.missing == ["age", "bmi", "cholesterol", "bp", "smoking"]
+
+
+def test_rolling_window_mean_and_trend():
+    features = PatientFeatures(window=3)
+    for value in (100, 110, 120, 130):
+        features.add_fasting(value)
+    snapshot = features.snapshot()
+    # Only the newest three readings are in the window
+    assert snapshot["fasting_mean"] == 120.0
+    assert snapshot["fasting_trend"] == 10.0
+    assert snapshot["fasting_readings"] == 4
+    assert snapshot["prev_fasting"] == 130
+
+
+def test_partial_updates_keep_other_fields():
+    store = FeatureStore()
+    full_reading(store)
+    snapshot = store.update("p1", fasting=140)
+    assert snapshot["bp"] == 120.0
+    assert snapshot["prev_fasting"] == 140.0
+    assert store.model_input("p1")[3] == 140.0
+
+
+def test_parse_structured_data():
+    fields = parse_structured_data({
+        "glucose": "95 mg/dL",
+        "blood_pressure": "130/85",
+        "cholesterol": "210 mg/dL",
+        "bmi": "",
+    })
+    assert fields == {"fasting": 95.0, "bp": 130.0, "cholesterol": 210.0}
+
+
+def test_parse_structured_data_drops_implausible_values():
+    fields = parse_structured_data({
+        "glucose": "9 mg/dL",
+        "blood_pressure": "12/05/2024",
+        "cholesterol": "1900 mg/dL",
+        "bmi": "27.4",
+    })
+    assert fields == {"bmi": 27.4}
+
+
+def test_update_from_ocr_ignores_date_as_blood_pressure():
+    store = FeatureStore()
+    store.update("p1", bp=120)
+    snapshot = store.update_from_ocr("p1", {"blood_pressure": "12/05"})
+    assert snapshot["bp"] == 120.0
+
+
+def test_update_from_ocr():
+    store = FeatureStore()
+    snapshot = store.update_from_ocr("p1", {"glucose": "101 mg/dL", "blood_pressure": "118/76"})
+    assert snapshot["prev_fasting"] == 101.0
+    assert snapshot["bp"] == 118.0
@@ -0,0 +1,148 @@
+"""
+Constant-memory monitoring of the inputs reaching /predict.
+
+Each feature keeps a histogram whose bin edges are the deciles of the
+training data, plus count/min/max/mean. Updating is a bisect and a few
+additions (about a microsecond per feature), memory does not grow with
+traffic, and drift against the training set is reported as the
+population stability index (PSI) over the same bins, once a feature has
+MIN_DRIFT_COUNT live values (psi and drift are null until then).
+Prediction scores are tracked the same way against the model's scores on
+the training set.
+
+Usage:
+    monitor = InputMonitor.from_training(df, ["age", "bmi"], train_scores)
+    monitor.observe({"age": 54, "bmi": 31.2}, score)
+    monitor.report()
+"""
+
+import bisect
+import math
+import os
+import threading
+
+# PSI above this is usually read as a significant shift
+DRIFT_THRESHOLD = 0.2
+# PSI is meaningless on a handful of requests; report it from this many on
+MIN_DRIFT_COUNT = int(os.environ.get("MONITOR_MIN_DRIFT_COUNT", "300"))
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _quantile_edges(values, bins):
+    """Interior bin edges at the training data's quantiles (duplicates removed)."""
+    ordered = sorted(float(v) for v in values)
+    if not ordered:
+        return []
+    edges = []
+    for i in range(1, bins):
+        edge = ordered[min(len(ordered) - 1, int(i * len(ordered) / bins))]
+        if not edges or edge > edges[-1]:
+            edges.append(edge)
+    return edges
+
+
+class FeatureSketch:
+    """Fixed-bin histogram with count, min, max and mean for one feature."""
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def proportions(self):
+        return [c / self.count for c in self.counts] if self.count else [0.0] * len(self.counts)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its histogram bin."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= target:
+                low = self.edges[i - 1] if i > 0 else self.min
+                high = self.edges[i] if i < len(self.edges) else self.max
+                low, high = max(low, self.min), min(high, self.max)
+                return low + (high - low) * (target - seen) / c
+            seen += c
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "quantiles": {f"p{int(q * 100)}": self.quantile(q) for q in QUANTILES},
+        }
+
+
+def psi(expected, actual, epsilon=1e-4):
+    """Population stability index between two binned distributions."""
+    total = 0.0
+    for e, a in zip(expected, actual):
+        e, a = max(e, epsilon), max(a, epsilon)
+        total += (a - e) * math.log(a / e)
+    return total
+
+
+class InputMonitor:
+    """Live sketches for each model feature and the prediction score."""
+
+    def __init__(self, baselines):
+        """baselines: dict of name -> FeatureSketch already fed the training data."""
+        self.baselines = baselines
+        self.live = {name: FeatureSketch(sketch.edges) for name, sketch in baselines.items()}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_training(cls, data, features, scores=None, bins=10):
+        """Build baselines from a training DataFrame (and the model's scores on it)."""
+        columns = {name: data[name].tolist() for name in features}
+        if scores is not None:
+            columns["prediction"] = [float(s) for s in scores]
+        baselines = {}
+        for name, values in columns.items():
+            sketch = FeatureSketch(_quantile_edges(values, bins))
+            for value in values:
+                sketch.update(float(value))
+            baselines[name] = sketch
+        return cls(baselines)
+
+    def observe(self, inputs, score=None):
+        """Record one request's feature values and, optionally, its score."""
+        with self._lock:
+            for name, value in inputs.items():
+                sketch = self.live.get(name)
+                if sketch is not None and value is not None:
+                    sketch.update(float(value))
+            if score is not None and "prediction" in self.live:
+                self.live["prediction"].update(float(score))
+
+    def report(self):
+        with self._lock:
+            report = {}
+            for name, live in self.live.items():
+                baseline = self.baselines[name]
+                drift = None
+                if live.count >= MIN_DRIFT_COUNT:
+                    drift = psi(baseline.proportions(), live.proportions())
+                report[name] = {
+                    "live": live.snapshot(),
+                    "baseline": baseline.snapshot(),
+                    "psi": round(drift, 4) if drift is not None else None,
+                    "drift": drift > DRIFT_THRESHOLD if drift is not None else None,
+                }
+            return report
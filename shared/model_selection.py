@@ -0,0 +1,103 @@
+"""
+Parallel cross-validated model selection for the training scripts.
+
+Every candidate is scored on the same precomputed fold splits, and the
+preprocessing step of the pipeline is cached with joblib.Memory, so the
+scaled fold matrices are computed once and reused by every estimator
+and hyperparameter setting. Candidates x folds run across all cores.
+
+Usage:
+    model, report = tune_model(X, y, candidates, cv, scoring, refit,
+                               report_path="model_report.json")
+"""
+
+import json
+import shutil
+import tempfile
+import time
+
+from joblib import Memory
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+
+def build_pipeline(cache_dir):
+    """Scaler + placeholder estimator; the scaler's output is cached per fold."""
+    return Pipeline(
+        [("scale", StandardScaler()), ("model", "passthrough")],
+        memory=Memory(cache_dir, verbose=0),
+    )
+
+
+def tune_model(X, y, candidates, cv, scoring, refit, report_path=None, n_jobs=-1):
+    """Search over candidate estimators and their hyperparameters.
+
+    Args:
+        X, y: Training features and target.
+        candidates: List of (estimator, param_grid) pairs. Grid keys are
+            bare estimator parameter names, e.g. {"C": [0.1, 1, 10]}.
+        cv: A scikit-learn splitter; its splits are computed once and
+            shared by every candidate.
+        scoring: Dict of metric name -> scorer.
+        refit: Metric used to pick the best model.
+        report_path: Where to write the JSON timing/metrics report.
+        n_jobs: Parallel jobs (-1 uses every core).
+
+    Returns:
+        (best fitted pipeline, report dict)
+    """
+    folds = list(cv.split(X, y))
+    param_grid = [
+        {"model": [estimator], **{f"model__{name}": values for name, values in grid.items()}}
+        for estimator, grid in candidates
+    ]
+
+    cache_dir = tempfile.mkdtemp(prefix="model_selection_")
+    try:
+        search = GridSearchCV(
+            build_pipeline(cache_dir),
+            param_grid,
+            scoring=scoring,
+            refit=refit,
+            cv=folds,
+            n_jobs=n_jobs,
+            error_score="raise",
+        )
+        start = time.perf_counter()
+        search.fit(X, y)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # The refit pipeline must not point at the deleted cache directory
+    best = search.best_estimator_
+    best.memory = None
+
+    results = search.cv_results_
+    candidates_report = []
+    for i, params in enumerate(results["params"]):
+        candidates_report.append({
+            "estimator": type(params["model"]).__name__,
+            "params": {k.split("__", 1)[1]: v for k, v in params.items() if k != "model"},
+            "fit_time": round(float(results["mean_fit_time"][i]), 4),
+            **{f"mean_{name}": round(float(results[f"mean_test_{name}"][i]), 4) for name in scoring},
+        })
+    chosen = candidates_report[search.best_index_]
+    candidates_report.sort(key=lambda c: c[f"mean_{refit}"], reverse=True)
+
+    report = {
+        "rows": int(len(y)),
+        "folds": len(folds),
+        "candidates": len(candidates_report),
+        "search_seconds": round(elapsed, 2),
+        "refit_seconds": round(float(search.refit_time_), 4),
+        "best_estimator": type(best.named_steps["model"]).__name__,
+        "best_params": chosen["params"],
+        "best_score": {name: chosen[f"mean_{name}"] for name in scoring},
+        "results": candidates_report,
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    return best, report
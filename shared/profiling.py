@@ -0,0 +1,254 @@
+"""
+On-demand request profiling for the Python services.
+
+A request is profiled at random with probability PROFILE_SAMPLE_RATE,
+or when it carries an `X-Profile: 1` header and the service was started
+with PROFILE_HEADER_ENABLED=1. The header is ignored by default, since
+any client could otherwise use it to load the service and its disk.
+
+The threads serving a profiled request are stack-sampled and the result
+is written to PROFILE_DIR as collapsed stacks (one `frame;frame;frame
+count` line per stack), which flamegraph.pl, speedscope and inferno read
+directly. File names end with the X-Profile-Id response header. Only
+the newest PROFILE_KEEP files are kept.
+
+When neither trigger is enabled, requests are not touched at all.
+Otherwise an unprofiled request costs a header lookup (and a random()
+call if sampling is enabled).
+
+Usage:
+    init_flask(app, "ocr")        # Flask
+    init_fastapi(app, "doctor")   # FastAPI
+    @profiled                     # on sync FastAPI endpoints, which run
+                                  # in a worker thread
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+# Honour the X-Profile request header (off by default)
+PROFILE_HEADER_ENABLED = os.environ.get("PROFILE_HEADER_ENABLED") == "1"
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))
+# Seconds between stack samples
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+MAX_STACK_DEPTH = 128
+
+_current_sampler = contextvars.ContextVar("profile_sampler", default=None)
+
+
+class StackSampler:
+    """Periodically records the call stacks of a set of threads."""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.started_at = time.monotonic()
+        self.profile_id = f"{os.getpid()}-{random.getrandbits(32):08x}"
+
+    def add_thread(self, thread_id):
+        self._threads.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        self._threads.discard(thread_id)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return time.monotonic() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[_collapse(frame)] += 1
+                    self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def should_profile(header_value):
+    if PROFILE_HEADER_ENABLED and header_value and header_value.strip().lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_profile(header_value):
+    """Start sampling the current thread if this request should be profiled."""
+    if not should_profile(header_value):
+        return None
+    sampler = StackSampler()
+    sampler.add_thread(threading.get_ident())
+    return sampler.start()
+
+
+def finish_profile(sampler, service, method, path):
+    """Stop sampling, write the collapsed stacks and apply retention.
+
+    Returns the profile file name.
+    """
+    elapsed = sampler.stop()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = path.strip("/").replace("/", "_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{service}-{method}-{slug}-{int(elapsed * 1000)}ms-{sampler.profile_id}.folded"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(sampler.collapsed())
+    _apply_retention()
+    return name
+
+
+def _apply_retention():
+    files = [os.path.join(PROFILE_DIR, f) for f in os.listdir(PROFILE_DIR) if f.endswith(".folded")]
+    if len(files) <= PROFILE_KEEP:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:-PROFILE_KEEP]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _SampledBody:
+    """Response body that adds the thread iterating it to a profile."""
+
+    def __init__(self, sampler, body):
+        self.sampler = sampler
+        self.body = body
+
+    def __iter__(self):
+        thread_id = threading.get_ident()
+        self.sampler.add_thread(thread_id)
+        try:
+            yield from self.body
+        finally:
+            self.sampler.remove_thread(thread_id)
+
+    def close(self):
+        close = getattr(self.body, "close", None)
+        if close is not None:
+            close()
+
+
+def profiled(func):
+    """Include a function's worker thread in the current request's profile."""
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        sampler = _current_sampler.get()
+        if sampler is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        sampler.add_thread(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.remove_thread(thread_id)
+    return wrapper
+
+
+def init_flask(app, service):
+    """Profile Flask requests (each request runs on a single thread)."""
+    if not (PROFILE_HEADER_ENABLED or PROFILE_SAMPLE_RATE > 0):
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        g.profile_sampler = start_profile(request.headers.get(PROFILE_HEADER))
+
+    @app.after_request
+    def _finish_profile(response):
+        sampler = g.pop("profile_sampler", None)
+        if sampler is None:
+            return response
+        response.headers["X-Profile-Id"] = sampler.profile_id
+        method, path = request.method, request.path
+        if response.is_streamed:
+            # A streamed body is generated after this hook returns, so keep
+            # sampling until the server closes the response
+            response.response = _SampledBody(sampler, response.response)
+            response.call_on_close(lambda: finish_profile(sampler, service, method, path))
+        else:
+            finish_profile(sampler, service, method, path)
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        # after_request is skipped when the view raised
+        sampler = g.pop("profile_sampler", None)
+        if sampler is not None:
+            finish_profile(sampler, service, request.method, request.path)
+
+
+class ProfileMiddleware:
+    """Plain ASGI middleware; requests pass straight through when profiling is off."""
+
+    def __init__(self, app, service):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_HEADER_ENABLED or PROFILE_SAMPLE_RATE > 0):
+            await self.app(scope, receive, send)
+            return
+        header_value = None
+        if PROFILE_HEADER_ENABLED:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    header_value = value.decode("latin-1")
+                    break
+        sampler = start_profile(header_value)
+        if sampler is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", sampler.profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_sampler.set(sampler)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current_sampler.reset(token)
+            finish_profile(sampler, self.service, scope["method"], scope["path"])
+
+
+def init_fastapi(app, service):
+    """Profile FastAPI requests (async endpoints run on the event loop thread)."""
+    app.add_middleware(ProfileMiddleware, service=service)